@@ -1,6 +1,6 @@
-import json
 from pprint import pprint
 
+import ijson
 from netaddr import IPNetwork
 from base_objects import Switch, VMEndpoint
 from generic_vm_objects import GenericRouter
@@ -18,7 +18,9 @@ class Load(AbstractPlugin):
         Load a CAIDA network topology from a JSON file and process its vertices.
         The JSON file should be created via the :ref:`caida.save_mc`.
         Populates the `self.switches` and `self.routers` dictionaries per the topology
-        and configures BGP for routers in a second pass over the data.
+        and configures BGP for routers in a second pass over the router vertices.
+        The vertices are streamed from the file one at a time, so only the router
+        vertices are kept in memory for the second pass.
 
         Args:
             filename (str): The path to the JSON file containing the topology data.
@@ -32,38 +34,53 @@ class Load(AbstractPlugin):
                 "This should be the output of ``caida.save``."
             )
 
-        with open(filename, "r", encoding="utf-8") as json_topology:
-            topology = json.load(json_topology)
-
-        topology = topology["vertices"]
-
         self.switches = {}
         self.routers = {}
+        self._router_vtxs = []
+        self._ipnet_cache = {}
 
-        for vtx in topology:
-            if "name" not in vtx:
-                print("Unable to load JSON vertex with no name:")
-                pprint(vtx)
-                continue
+        # Decode real numbers as floats (matching the standard ``json`` module)
+        # rather than building a ``Decimal`` for each one
+        with open(filename, "rb") as json_topology:
+            for vtx in ijson.items(json_topology, "vertices.item", use_float=True):
+                self.handle_vertex(vtx)
 
-            if "type" not in vtx:
-                print("Unable to load JSON vertex with no type:")
-                pprint(vtx)
-                continue
+        # Need all routers created before BGP is configured.
+        # This forces a second pass over the router vertices
+        for vtx in self._router_vtxs:
+            self.handle_bgp(vtx)
+
+    def handle_vertex(self, vtx):
+        """
+        Dispatches a single vertex from the topology to the handler for its type.
+        The BGP configuration of router vertices is retained so that BGP can be
+        configured once all routers have been created.
 
-            if vtx["type"] == "host":
-                self.handle_host(vtx)
-            elif vtx["type"] == "router":
-                self.handle_router(vtx)
-            else:
-                print(f"No load handler for vertex of type: {vtx['name']}")
-                pprint(vtx)
+        Args:
+            vtx (dict): The vertex dictionary from the JSON topology.
+        """
+        if "name" not in vtx:
+            print("Unable to load JSON vertex with no name:")
+            pprint(vtx)
+            return
 
-        # Need all routers created before BGP is configured.
-        # This forces a second pass over the data
-        for vtx in topology:
-            if "type" in vtx and vtx["type"] == "router":
-                self.handle_bgp(vtx)
+        if "type" not in vtx:
+            print("Unable to load JSON vertex with no type:")
+            pprint(vtx)
+            return
+
+        if vtx["type"] == "host":
+            self.handle_host(vtx)
+        elif vtx["type"] == "router":
+            self.handle_router(vtx)
+            # Only keep what the BGP pass needs, not the full vertex
+            if "bgp" in vtx.get("routing", {}):
+                self._router_vtxs.append(
+                    {"name": vtx["name"], "routing": vtx["routing"]}
+                )
+        else:
+            print(f"No load handler for vertex of type: {vtx['name']}")
+            pprint(vtx)
 
     def handle_host(self, vtx):
         """
@@ -75,10 +92,11 @@ class Load(AbstractPlugin):
         host = Vertex(self.g, vtx["name"])
         host.decorate(VMEndpoint)
 
-        try:
-            self.add_interfaces(host, vtx["interfaces"])
-        except KeyError:
+        if "interfaces" not in vtx:
             print(f"No interfaces for host: {host.name}")
+            return
+
+        self.add_interfaces(host, vtx["interfaces"])
 
     def add_interfaces(self, vertex, interfaces):
         """
@@ -139,29 +157,40 @@ class Load(AbstractPlugin):
 
         router = self.routers[vtx["name"]]
 
-        try:
-            bgp = vtx["routing"]["bgp"]
-        except KeyError:
+        bgp = vtx.get("routing", {}).get("bgp")
+        if bgp is None:
             return
 
-        try:
-            for network in bgp["networks"]:
-                router.add_bgp_network(IPNetwork(network))
-        except KeyError:
-            # Not all BGP routers advertise their own networks
-            pass
+        # Not all BGP routers advertise their own networks
+        for network in bgp.get("networks", ()):
+            router.add_bgp_network(self.get_network(network))
 
-        try:
-            for peer in bgp["neighbors"]:
-                switch = self.get_switch(bgp["neighbors"][peer])
+        for peer, switch_name in bgp.get("neighbors", {}).items():
+            switch = self.get_switch(switch_name)
 
-                if peer not in self.routers:
-                    print(f"Cannot find BGP peer: {peer}")
-                    continue
+            if peer not in self.routers:
+                print(f"Cannot find BGP peer: {peer}")
+                continue
+
+            router.link_bgp(self.routers[peer], switch)
 
-                router.link_bgp(self.routers[peer], switch)
-        except KeyError:
-            pass
+    def get_network(self, network):
+        """
+        Parses the network string, reusing the result if the same network has
+        already been seen. Routers copy the network when it is added, so the
+        cached object is never shared between them.
+
+        Args:
+            network (str): The network in CIDR notation.
+
+        Returns:
+            netaddr.IPNetwork: The parsed network.
+        """
+        ipnet = self._ipnet_cache.get(network)
+        if ipnet is None:
+            ipnet = IPNetwork(network)
+            self._ipnet_cache[network] = ipnet
+        return ipnet
 
     def get_switch(self, switch_name):
         """
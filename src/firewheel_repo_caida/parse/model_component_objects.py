@@ -1,6 +1,22 @@
 import pytricia
 
 
+def _tree_key(subnet):
+    """
+    Build the key used to store a subnet in the annotation tree.
+
+    pytricia accepts a tuple of the packed network address and prefix length,
+    which avoids formatting the subnet as a string for every insert and lookup.
+
+    Args:
+        subnet (netaddr.IPNetwork): The subnet to convert.
+
+    Returns:
+        tuple: The packed network address and the prefix length of the subnet.
+    """
+    return (subnet.first.to_bytes(4, "big"), subnet.prefixlen)
+
+
 class ASAnnotation(object):
     """
     The ASAnnotation class is used to manage and annotate Autonomous System (AS)
@@ -15,7 +31,7 @@ class ASAnnotation(object):
         Args:
             name (str): The name of the annotation.
         """
-        self.tree = pytricia.PyTricia()
+        self.tree = pytricia.PyTricia(32)
         self.type = "annotation"
         self.name = name
 
@@ -28,7 +44,7 @@ class ASAnnotation(object):
             as_name (str): The name of the Autonomous System (AS) associated with the subnet.
             switch (base_objects.Switch): The Switch associated with the subnet.
         """
-        self.tree[str(new_subnet)] = (as_name, switch)
+        self.tree[_tree_key(new_subnet)] = (as_name, switch)
 
     def get_as_for_subnet(self, subnet):
         """
@@ -40,7 +56,7 @@ class ASAnnotation(object):
         Returns:
             str: The AS name associated with the subnet.
         """
-        return self.tree[str(subnet)][0]
+        return self.tree[_tree_key(subnet)][0]
 
     def get_switch_for_subnet(self, subnet):
         """
@@ -52,7 +68,7 @@ class ASAnnotation(object):
         Returns:
             base_objects.Switch: The Switch associated with the subnet.
         """
-        return self.tree[str(subnet)][1]
+        return self.tree[_tree_key(subnet)][1]
 
     def is_network_in_tree(self, subnet):
         """
@@ -64,4 +80,4 @@ class ASAnnotation(object):
         Returns:
             bool: :py:data:`True` if the subnet is present in the tree, :py:data:`False` otherwise.
         """
-        return str(subnet) in self.tree
+        return _tree_key(subnet) in self.tree
@@ -1,6 +1,7 @@
 import os
+import re
+import sys
 import gzip
-import contextlib
 from itertools import product
 
 import netaddr
@@ -14,6 +15,48 @@ current_module_path = os.path.abspath(os.path.dirname(__file__))
 aslinks_default = os.path.join(current_module_path, "cycle-aslinks.txt.gz")
 bgp_table_default = os.path.join(current_module_path, "routeviews.gz")
 
+# Matches the link type, ``from_AS``, and ``to_AS`` fields of an AS links line
+_LINK_RE = re.compile(r"([DI])\s+(\S+)\s+(\S+)")
+# Splits a CAIDA AS field on both the MOAS (``_``) and AS set (``,``) separators
+_AS_SPLIT_RE = re.compile(r"[_,]")
+# Replaces the separators of a CIDR string when building a BGP network switch name
+_BGP_NET_SWITCH_TRANS = str.maketrans("./", "--")
+
+
+def _parse_bgp_table_lines(lines):
+    """
+    Parse lines from a CAIDA prefix-to-AS table.
+
+    Each line takes the form::
+
+        network     cidr        AS
+
+    Note:
+        Currently, multi-origin AS (MOAS) isn't supported, so if this is the case
+        then the first AS is chosen.
+
+    Args:
+        lines (iterable): The lines from the BGP table.
+
+    Yields:
+        tuple: A ``(netaddr.IPNetwork, str)`` tuple of the network and AS number
+        for each line.
+
+    Raises:
+        ValueError: If a line in the BGP table is malformatted.
+    """
+    for line in lines:
+        try:
+            (net, cidr, as_str) = line.split()
+
+            network = netaddr.IPNetwork("%s/%s" % (net, cidr))
+            as_number = _AS_SPLIT_RE.split(as_str, maxsplit=1)[0]
+
+        except Exception as exc:
+            raise ValueError("Poorly formatted BGP table line: %s" % exc) from exc
+
+        yield network, as_number
+
 
 class ParseCAIDA(AbstractPlugin):
     """
@@ -56,13 +99,19 @@ class ParseCAIDA(AbstractPlugin):
                 example filename would be ``routeviews-rv2-20180731-1200.pfx2as.gz``.
         """
         self.vertices = {}
-        self.link_attrs = {}
+        self.link_pairs = set()
 
         # We need to be able to build a subnet tree to keep track of the
         # AS' networks
         self.tree = Vertex(self.g)
         self.tree.decorate(ASAnnotation, init_args=["ANNOTATION_subnet_tree"])
 
+        # Every AS link is also connected to the BGP control network. The netmask
+        # is rebuilt by netaddr on every access, so only compute it once.
+        self.control_net = netaddr.IPNetwork("10.192.0.0/10")
+        self.control_net_netmask = self.control_net.netmask
+        self.control_net_hosts = self._iter_host_addresses(self.control_net)
+
         # First the AS map with links will be built, and then the
         # appropriate BGP networks will be assigned
         self.log.debug("Generate AS links")
@@ -84,17 +133,11 @@ class ParseCAIDA(AbstractPlugin):
         Args:
             aslinks (str): The AS links file to parse and import.
         """
-        if aslinks.endswith(".gz"):
-            with gzip.open(aslinks, "rt") as linkstream:
-                data = linkstream.read()
-        else:
-            with open(aslinks, "r", encoding="utf-8") as linkstream:
-                data = linkstream.read()
-
-        for line in data.splitlines():
-            if line[:1] == "D" or line[:1] == "I":
-                # This is a direct link, process it
-                self.process_direct_link_line(line)
+        with self._open_data_file(aslinks) as linkstream:
+            for line in linkstream:
+                if line[:1] == "D" or line[:1] == "I":
+                    # This is a direct link, process it
+                    self.process_direct_link_line(line.rstrip("\n"))
 
     def process_direct_link_line(self, line):
         """
@@ -127,93 +170,96 @@ class ParseCAIDA(AbstractPlugin):
 
         Args:
             line (str): The line from the AS links file representing a direct link.
-        """  # noqa: DOC501
-        try:
-            line += " a b c  d"
-            (d, from_ases_str, to_ases_str, _mons) = line.split(None, 3)
-            if d not in {"D", "I"}:
-                raise RuntimeError("Not direct link")
-
-            from_ases = self._get_AS_list(from_ases_str)
-            to_ases = self._get_AS_list(to_ases_str)
-
-        except (RuntimeError, ValueError) as e:
-            self.log.exception("Line in wrong format: %s", e)
+        """
+        match = _LINK_RE.match(line)
+        if match is None:
+            self.log.warning("Line in wrong format: %s", line)
             return
 
+        # An AS can be listed more than once in a set, so drop any repeats
+        # (keeping the first-seen order) before pairing them up
+        from_ases = dict.fromkeys(self._get_AS_list(match.group(2)))
+        to_ases = dict.fromkeys(self._get_AS_list(match.group(3)))
+
         # Now, for each link, we need to add the appropriate link in the graph
         for from_as, to_as in product(from_ases, to_ases):
             from_name = self._get_AS_name(from_as)
             to_name = self._get_AS_name(to_as)
 
-            # First, check if this has already been processed
-            if (from_name, to_name) in self.link_attrs or (
-                to_name,
-                from_name,
-            ) in self.link_attrs:
+            # First, check if this has already been processed. Links are
+            # undirected, so the pair is stored in sorted order.
+            if from_name < to_name:
+                link_pair = (from_name, to_name)
+            else:
+                link_pair = (to_name, from_name)
+            if link_pair in self.link_pairs:
                 continue
+            self.link_pairs.add(link_pair)
 
             # Add a link to the special BGP control plane
             switch_name = "SWITCH_BGP_CONTROL"
             # Create the switch
-            try:
-                switch = self.vertices[switch_name]
-            except KeyError:
-                self.vertices[switch_name] = Vertex(self.g, switch_name)
-                switch = self.vertices[switch_name]
+            switch = self.vertices.get(switch_name)
+            if switch is None:
+                switch = Vertex(self.g, switch_name)
+                self.vertices[switch_name] = switch
                 switch.netplane = 0
                 switch.decorate(Switch)
+                switch.network = self.control_net
 
             # And add in the neighbor details
             # We don't have the IP address yet, so we won't add that in
-            try:
-                self.vertices[from_name]
-            except KeyError:
-                from_vm = Vertex(self.g, from_name)
-                from_vm.decorate(GenericRouter)
-                self.vertices[from_name] = from_vm
+            from_vm = self.vertices.get(from_name)
+            if from_vm is None:
+                from_vm = self._add_router(from_name)
 
-            try:
-                self.vertices[to_name]
-            except KeyError:
-                to_vm = Vertex(self.g, to_name)
-                to_vm.decorate(GenericRouter)
-                self.vertices[to_name] = to_vm
+            to_vm = self.vertices.get(to_name)
+            if to_vm is None:
+                to_vm = self._add_router(to_name)
 
             # Make a 'false' link between the two
-            self.link_attrs[from_name, to_name] = Edge(
-                self.vertices[from_name], self.vertices[to_name]
-            )
-            self.link_attrs[from_name, to_name].false = True
-
-            self.control_net_hosts = getattr(self, "control_net_hosts", None)
-            if self.control_net_hosts is None:
-                try:
-                    self.control_net_hosts = switch.network.iter_hosts()
-                except AttributeError:
-                    control_net = netaddr.IPNetwork("10.192.0.0/10")
-                    switch.network = control_net
-                    self.control_net_hosts = switch.network.iter_hosts()
+            link = Edge(from_vm, to_vm)
+            link.false = True
 
             # Make links to the switch
-            netmask = switch.network.netmask
-            _iface_name, _edge = self.vertices[from_name].connect(
+            netmask = self.control_net_netmask
+            _iface_name, _edge = from_vm.connect(
                 switch, next(self.control_net_hosts), netmask
             )
-            _iface_name, _edge = self.vertices[to_name].connect(
+            _iface_name, _edge = to_vm.connect(
                 switch, next(self.control_net_hosts), netmask
             )
 
             # We need to fill in these details both here and in
             # processing BGP networks because it's possible ASes may
             # not have neighbors or may not have networks
-            with contextlib.suppress(AttributeError):
-                self.vertices[from_name].set_bgp_as(from_as)
-                self.vertices[to_name].set_bgp_as(to_as)
+            try:
+                from_vm.set_bgp_as(from_as)
+                to_vm.set_bgp_as(to_as)
                 # This method sets up the BGP information on both vertices.
-                self.vertices[from_name].link_bgp(
-                    self.vertices[to_name], switch, switch
-                )
+                from_vm.link_bgp(to_vm, switch, switch)
+            except AttributeError:
+                pass
+
+    def _add_router(self, as_name):
+        """
+        Create the router vertex for an AS and add it to ``self.vertices``.
+
+        Note:
+            Decoration is done per vertex rather than by copying a pre-decorated
+            prototype, since :py:meth:`decorate` binds each method to its vertex and
+            runs the ``GenericRouter`` initializer, which creates per-vertex state.
+
+        Args:
+            as_name (str): The name of the AS router vertex.
+
+        Returns:
+            Vertex: The new router vertex.
+        """
+        router = Vertex(self.g, as_name)
+        router.decorate(GenericRouter)
+        self.vertices[as_name] = router
+        return router
 
     def assign_bgp_networks(self, bgp_table):
         """
@@ -221,91 +267,102 @@ class ParseCAIDA(AbstractPlugin):
 
         Args:
             bgp_table (str): The file mapping AS numbers to IP networks.
+
+        Raises:
+            ValueError: If a line in the BGP table is malformatted.
         """
-        if bgp_table.endswith(".gz"):
-            with gzip.open(bgp_table, "rt") as tablestream:
-                data = tablestream.read()
-        else:
-            with open(bgp_table, "r", encoding="utf-8") as tablestream:
-                data = tablestream.read()
+        with self._open_data_file(bgp_table) as tablestream:
+            for network, as_number in _parse_bgp_table_lines(tablestream):
+                self.add_bgp_table_network(network, as_number)
 
-        for line in data.splitlines():
-            self.process_bgp_table_line(line)
+    def add_bgp_table_network(self, network, as_number):
+        """
+        Add the given BGP network from the BGP table to the appropriate AS in the graph.
 
-        tablestream.close()
+        Note:
+            Each network is added to the subnet tree as soon as it is processed
+            rather than in a batch at the end. The tree lookup in this method depends
+            on those earlier inserts to skip networks that are already covered by a
+            previous entry.
 
-    def process_bgp_table_line(self, line):
+        Args:
+            network (netaddr.IPNetwork): The network to advertise.
+            as_number (str): The number of the AS which advertises the network.
         """
-        Process the given line in the BGP table by adding the BGP networks to the appropriate
-        ASes in the graph.
+        as_name = self._get_AS_name(as_number)
 
-        This line takes the form::
+        # Many ASes in the BGP table have no links. Checking for those first is a
+        # single dictionary lookup and saves walking the subnet tree for them.
+        vertex = self.vertices.get(as_name)
+        if vertex is None:
+            # self.log.warning('%s has no links', as_name)
+            return
 
-            network     cidr        AS
+        # Check if this network has already been processed
+        if self.tree.is_network_in_tree(network):
+            return
 
-        Note:
-            Currently, multi-origin AS (MOAS) isn't supported, so if this is the case
-            then the first entry is chosen.
+        # Add in this new network
+        vertex.add_bgp_network(network)
 
-        Args:
-            line (str): The line from the BGP table representing a network, CIDR, and AS.
+        # Now, build the switch for the new BGP network.
+        # Do this now so we can add a complete record to the subnet tree
+        # annotation.
+        bgp_net_hosts = network.iter_hosts()
 
-        Raises:
-            ValueError: If the line in the BGP table is malformatted.
-        """
+        bgp_net_switch = self._get_bgp_net_switch(network)
+        if bgp_net_switch not in self.vertices:
+            self.vertices[bgp_net_switch] = Vertex(self.g)
+            self.vertices[bgp_net_switch].decorate(Switch, init_args=[bgp_net_switch])
+        switch = self.vertices[bgp_net_switch]
+        switch.network = network
+        switch.skip_create_network = True
+
+        # Form the edge between the switch and the router.
         try:
-            (net, cidr, as_str) = line.split()
+            vertex.connect(switch, next(bgp_net_hosts), network.netmask)
+        except StopIteration:
+            # Add the AS to the subnet tree either way.
+            self.log.warning("Unable to fit router on %s, skipping", network)
 
-            network = netaddr.IPNetwork("%s/%s" % (net, cidr))
-            ases = self._get_AS_list(as_str)
+        # Finally, add this AS and network to the subnet tree
+        self.tree.add_subnet(network, as_name, switch)
 
-            # At the moment, multi-origin AS (MOAS) isn't supported, so return the first AS
-            ases = [ases[0]]
+    def _iter_host_addresses(self, network):
+        """
+        Iterate over the usable host addresses of an IPv4 network.
 
-        except Exception as exc:
-            raise ValueError("Poorly formatted BGP table line: %s" % exc) from exc
+        This yields the same addresses as :py:meth:`netaddr.IPNetwork.iter_hosts`
+        (skipping the network and broadcast addresses), building each
+        :py:class:`netaddr.IPAddress` directly from its integer value rather than
+        going through a string.
 
-        # Check if this network has already been processed
-        if self.tree.is_network_in_tree(network):
-            return
+        Args:
+            network (netaddr.IPNetwork): The network to iterate over.
 
-        for autosys in ases:
-            # Now, add this network to the AS
-            as_name = self._get_AS_name(autosys)
+        Returns:
+            iterator: An iterator of the :py:class:`netaddr.IPAddress` host addresses.
+        """
+        return (
+            netaddr.IPAddress(value, 4)
+            for value in range(network.first + 1, network.last)
+        )
 
-            try:
-                vertex = self.vertices[as_name]
-            except KeyError:
-                # self.log.warning('%s has no links', as_name)
-                continue
+    def _open_data_file(self, filename):
+        """
+        Open a CAIDA data file for reading text, decompressing it if it is gzipped.
+        The returned file is iterated line by line so that the whole file never has
+        to be held in memory.
 
-            # Add in this new network
-            vertex.add_bgp_network(network)
-
-            # Now, build the switch for the new BGP network.
-            # Do this now so we can add a complete record to the subnet tree
-            # annotation.
-            bgp_net_hosts = network.iter_hosts()
-
-            bgp_net_switch = self._get_bgp_net_switch(network)
-            if bgp_net_switch not in self.vertices:
-                self.vertices[bgp_net_switch] = Vertex(self.g)
-                self.vertices[bgp_net_switch].decorate(
-                    Switch, init_args=[bgp_net_switch]
-                )
-            switch = self.vertices[bgp_net_switch]
-            switch.network = network
-            switch.skip_create_network = True
-
-            # Form the edge between the switch and the router.
-            try:
-                vertex.connect(switch, next(bgp_net_hosts), network.netmask)
-            except StopIteration:
-                # Add the AS to the subnet tree either way.
-                self.log.warning("Unable to fit router on %s, skipping", network)
+        Args:
+            filename (str): The path of the file to open.
 
-            # Finally, add this AS and network to the subnet tree
-            self.tree.add_subnet(network, as_name, switch)
+        Returns:
+            io.TextIOBase: The opened file.
+        """
+        if filename.endswith(".gz"):
+            return gzip.open(filename, "rt", encoding="utf-8")
+        return open(filename, "r", encoding="utf-8")
 
     def _get_AS_list(self, as_str):  # noqa: N802
         """
@@ -321,12 +378,8 @@ class ParseCAIDA(AbstractPlugin):
         Returns:
             list: A list of AS numbers.
         """
-        ases = []
-        for asblock in as_str.split("_"):
-            for autosys in asblock.split(","):
-                ases.append(autosys)  # noqa: PERF402
-
-        return ases
+        # The same ASes appear on many lines, so share a single string for each
+        return [sys.intern(autosys) for autosys in _AS_SPLIT_RE.split(as_str)]
 
     def _get_AS_name(self, as_number):  # noqa: N802
         """
@@ -338,7 +391,7 @@ class ParseCAIDA(AbstractPlugin):
         Returns:
             str: The AS name in the graph.
         """
-        return "router.AS%s.as.net" % as_number
+        return sys.intern(f"router.AS{as_number}.as.net")
 
     def _get_switch_name(self, from_as, to_as):
         """
@@ -363,13 +416,13 @@ class ParseCAIDA(AbstractPlugin):
         Returns:
             str: The canonical switch name for the BGP network.
         """
-        return "BGP-" + str(net.cidr).replace(".", "-").replace("/", "-")
+        return "BGP-" + str(net.cidr).translate(_BGP_NET_SWITCH_TRANS)
 
     def remove_ospf_info(self):
         """
         Set all OSPF parameters to None.
         """
-        for vertex in self.vertices:
-            self.vertices[vertex].bgp_over_ospf_redistribution = None
-            self.vertices[vertex].ospf_over_bgp_redistribution = None
-            self.vertices[vertex].ospf = None
+        for vertex in self.vertices.values():
+            vertex.bgp_over_ospf_redistribution = None
+            vertex.ospf_over_bgp_redistribution = None
+            vertex.ospf = None
@@ -1,3 +1,6 @@
+import logging
+from itertools import chain
+
 import netaddr
 from base_objects import Switch
 from generic_vm_objects import GenericRouter
@@ -18,7 +21,7 @@ class PruneCAIDA(AbstractPlugin):
         Finds and removes all routers that aren't in a shortest path.
 
         This method performs the following steps:
-        1. Weights edges and removes specific edges.
+        1. Removes the edges to the BGP control switch.
         2. Removes all coloring from vertices.
         3. Finds shortest paths and colors vertices in those paths.
         4. Restores deleted edges.
@@ -36,74 +39,81 @@ class PruneCAIDA(AbstractPlugin):
 
     def weight_and_remove_edges(self):
         """
-        Weights edges and removes specific edges.
+        Removes the edges to the BGP control switch so that shortest paths
+        are not routed through it. No weights are currently assigned.
         """
-        counter = 0
-        self.log.debug("Weighting %d edges.", len(list(self.g.get_edges())))
         to_delete = []
-        for edge in self.g.get_edges():
-            if edge is None:
-                continue
+        control_switch = self.g.find_vertex("SWITCH_BGP_CONTROL")
+        if control_switch is None:
+            self.log.debug("No SWITCH_BGP_CONTROL found, no edges to remove.")
+            self.to_delete = to_delete
+            return
+
+        # Only the control switch's own edges are removed, so walk its
+        # adjacency rather than every edge in the graph
+        for edge_data in self.g.g.adj[control_switch.graph_id].values():
+            edge = edge_data["object"]
             if (
                 edge.source.type == "annotation"
                 or edge.destination.type == "annotation"
             ):
                 continue
-            counter += 1
-            try:
-                if (
-                    edge.source.name == "SWITCH_BGP_CONTROL"
-                    or edge.destination.name == "SWITCH_BGP_CONTROL"
-                ):
-                    to_delete.append(edge)
-            except AttributeError:
-                pass
+            to_delete.append(edge)
         for edge in to_delete:
             edge.delete()
-        self.log.debug("Added weights to %d edges.", counter)
+        self.log.debug("Removed %d edges to SWITCH_BGP_CONTROL.", len(to_delete))
         self.to_delete = to_delete
 
     def remove_coloring(self):
         """
         Removes all coloring from vertices.
+        This also sorts the vertices into routers, switches, and hosts so that
+        the later steps do not need to check every vertex in the graph again.
         """
-        host_count = 0
-        router_count = 0
+        self._routers = []
+        self._switches = []
+        self._hosts = []
         for vertex in self.g.get_vertices():
             vertex.colored = False
 
             if vertex.is_decorated_by(GenericRouter):
-                router_count += 1
-            if (
-                not vertex.is_decorated_by(GenericRouter)
-                and not vertex.is_decorated_by(Switch)
-                and not vertex.type == "annotation"
-            ):
-                host_count += 1
+                self._routers.append(vertex)
+            elif vertex.is_decorated_by(Switch):
+                self._switches.append(vertex)
+            elif not vertex.type == "annotation":
+                self._hosts.append(vertex)
 
-        self.log.debug("\t> prune caida: %d hosts/%d routers", host_count, router_count)
+        self.log.debug(
+            "\t> prune caida: %d hosts/%d routers", len(self._hosts), len(self._routers)
+        )
 
     def find_and_color_shortest_paths(self):
         """
         Finds shortest paths and colors vertices in those paths.
         """
         self.log.debug("\t=> finding shortest paths: ")
-        host_filter = (  # noqa: E731
-            lambda vertex: (not vertex.is_decorated_by(GenericRouter))
-            and (not vertex.is_decorated_by(Switch))
-            and (not vertex.type == "annotation")
-        )
+        host_ids = {host.graph_id for host in self._hosts}
 
-        def path_action(source, dest, path):
-            for vert in path:
-                vert.colored = True
-            source.colored = True
-            dest.colored = True
+        def host_filter(vertex):
+            return vertex.graph_id in host_ids
+
+        # The same vertices show up on many paths, so collect their graph IDs
+        # (which are much cheaper to hash than the vertices themselves) and
+        # color each vertex once after all of the paths have been found.
+        path_ids = set()
+
+        def path_action(_source, _dest, path):
+            # The path includes both the source and the destination
+            path_ids.update([vert.graph_id for vert in path])
 
         self.g.filtered_all_pairs_shortest_path(
             vertex_filter=host_filter, path_action=path_action, num_workers=32
         )
 
+        for vert in chain(self._routers, self._switches, self._hosts):
+            if vert.graph_id in path_ids:
+                vert.colored = True
+
     def restore_deleted_edges(self):
         """
         Restores deleted edges.
@@ -114,13 +124,15 @@ class PruneCAIDA(AbstractPlugin):
         objects.
         """
         self.log.debug("Restoring %d deleted edges.", len(self.to_delete))
+        add_edge = self.g._add_edge
+        adj = self.g.g.adj
         for edge in self.to_delete:
             # Until there is an `undelete` method for an edge, this will sufficiently
             # reverse the process while keeping the original graph IDs.
-            edge.source.g._add_edge(edge.source.graph_id, edge.destination.graph_id)
-            edge.source.g.g.adj[edge.source.graph_id][edge.destination.graph_id][
-                "object"
-            ] = edge
+            source_id = edge.source.graph_id
+            dest_id = edge.destination.graph_id
+            add_edge(source_id, dest_id)
+            adj[source_id][dest_id]["object"] = edge
             edge.valid = True
 
     def prune_non_colored_nodes(self):
@@ -130,41 +142,47 @@ class PruneCAIDA(AbstractPlugin):
         self.log.debug("\t=> deleting from graph")
 
         rtr_delete_list = []
-        for rtr in filter(
-            lambda vertex: vertex.is_decorated_by(GenericRouter), self.g.get_vertices()
-        ):
-            try:
-                if rtr.colored is not True:
-                    rtr_delete_list.append(rtr)
-            except AttributeError:
+        for rtr in self._routers:
+            if getattr(rtr, "colored", False) is not True:
                 rtr_delete_list.append(rtr)
         self.log.info("\t=> deleting %d routers from graph", len(rtr_delete_list))
         self.deleted_routers = set()
         for rtr in rtr_delete_list:
-            router_as = rtr.routing["bgp"]["parameters"]["router-as"]
+            bgp = rtr.routing.get("bgp", {})
+            router_as = bgp.get("parameters", {}).get("router-as")
             if router_as:
                 self.deleted_routers.add(router_as)
-            rtr.delete()
+        self._delete_vertices(rtr_delete_list)
+        self._routers = [rtr for rtr in self._routers if rtr.valid]
 
         # Prune switches.
         switch_delete_list = []
-        for switch in filter(
-            lambda vertex: vertex.is_decorated_by(Switch), self.g.get_vertices()
-        ):
+        for switch in self._switches:
             # Then, prune off the disconnected switches
             if switch.get_degree() == 0:
                 switch_delete_list.append(switch)
                 continue
             # Additionally, nix all switches that aren't colored but are connected
-            try:
-                if switch.colored is not True and switch.name.startswith("BGP-"):
-                    switch_delete_list.append(switch)
-            except AttributeError:
-                if switch.name.startswith("BGP-"):
-                    switch_delete_list.append(switch)
+            colored = getattr(switch, "colored", False)
+            if colored is not True and switch.name.startswith("BGP-"):
+                switch_delete_list.append(switch)
         self.log.info("\t=> deleting %d switches from graph", len(switch_delete_list))
-        for switch in switch_delete_list:
-            switch.delete()
+        self._delete_vertices(switch_delete_list)
+        self._switches = [switch for switch in self._switches if switch.valid]
+
+    def _delete_vertices(self, vertices):
+        """
+        Remove several vertices from the graph at once.
+        This is the same as calling :py:meth:`firewheel.control.experiment_graph.Vertex.delete`
+        on each of them, but NetworkX removes all of the nodes in a single call.
+
+        Args:
+            vertices (list): The :py:class:`firewheel.control.experiment_graph.Vertex`
+                instances to delete.
+        """
+        self.g.g.remove_nodes_from([vertex.graph_id for vertex in vertices])
+        for vertex in vertices:
+            vertex.valid = False
 
     def clean_up_interfaces_and_bgp_neighbors(self):
         """
@@ -173,14 +191,15 @@ class PruneCAIDA(AbstractPlugin):
         self.log.info(
             "\t=> cleaning up interfaces, BGP neighbors, and advertised networks"
         )
-        for as_vtx in filter(
-            lambda vertex: vertex.is_decorated_by(GenericRouter), self.g.get_vertices()
-        ):
-            self.log.info("We are on Vertex %s", as_vtx.name)
+        # Check the log level once rather than making a logging call per router
+        log_vertices = self.log.isEnabledFor(logging.INFO)
+        for as_vtx in self._routers:
+            if log_vertices:
+                self.log.info("We are on Vertex %s", as_vtx.name)
             # Clean up interfaces to only connected switches
             neighbors = as_vtx.get_neighbors()
-            good_switches = []
-            good_nets = []
+            good_switches = set()
+            good_nets = set()
             for neighbor in neighbors:
                 if not neighbor.is_decorated_by(Switch):
                     continue
@@ -189,9 +208,9 @@ class PruneCAIDA(AbstractPlugin):
                     and not neighbor.name == "SWITCH_BGP_CONTROL"
                 ):
                     continue
-                good_switches.append(neighbor.name)
+                good_switches.add(neighbor.name)
                 assert isinstance(neighbor.network, netaddr.IPNetwork)
-                good_nets.append(neighbor.network)
+                good_nets.add(neighbor.network)
 
             ifs = as_vtx.interfaces.interfaces
             if not ifs:
@@ -200,53 +219,39 @@ class PruneCAIDA(AbstractPlugin):
             # Need to cull the number of interfaces that are on the BGP control switch.
             # We don't need them all and it makes booting the topology difficult
 
-            # Copy over only good ifs, changing ethX as appropriate
-            del_list = []
-            for iface in ifs:
-                try:
-                    if iface["switch"].name not in good_switches:
-                        # Do not copy it over
-                        del_list.append(iface)
-                except KeyError:
-                    pass
-            for iface in del_list:
-                as_vtx.interfaces.del_interface(iface["name"])
-
-            if del_list:
+            # Copy over only good ifs, changing ethX as appropriate. The list is
+            # rebuilt once instead of deleting the interfaces one at a time.
+            good_ifs = [
+                iface
+                for iface in ifs
+                if "switch" not in iface or iface["switch"].name in good_switches
+            ]
+            if len(good_ifs) != len(ifs):
+                as_vtx.interfaces.interfaces = good_ifs
                 as_vtx.interfaces.rekey_interfaces()
 
-            # Similarly, kill all BGP networks no longer connected
-            try:
-                bgp_nets = as_vtx.routing["bgp"]["networks"]
+            bgp_config = as_vtx.routing.get("bgp")
+            if not bgp_config:
+                continue
 
-                if bgp_nets:
-                    for bgp in list(bgp_nets):
-                        assert isinstance(bgp, netaddr.IPNetwork)
-                        if bgp not in good_nets:
-                            bgp_nets.remove(bgp)
-            except KeyError:
-                # Key errors aren't a problem, just means bgp_nets don't exist
-                pass
+            # Similarly, kill all BGP networks no longer connected.
+            # Not every BGP router advertises its own networks.
+            bgp_nets = bgp_config.get("networks")
+            if bgp_nets:
+                assert all(isinstance(bgp, netaddr.IPNetwork) for bgp in bgp_nets)
+                bgp_nets[:] = [bgp for bgp in bgp_nets if bgp in good_nets]
 
             # Next, clear any BGP neighbors that aren't connected
-            try:
-                bgps = as_vtx.routing["bgp"]["neighbors"]
-
-                if bgps:
-                    for bgp in list(bgps):
-                        # remote_as = bgp['remote-as']
-                        if bgp["remote-as"] in self.deleted_routers:
-                            bgps.remove(bgp)
-
-                        # Also, remove self links
-                        if (
-                            bgp["remote-as"]
-                            == as_vtx.routing["bgp"]["parameters"]["router-as"]
-                        ):
-                            bgps.remove(bgp)
-            except KeyError:
-                # Similar to above, just means no neighbors
-                pass
+            bgps = bgp_config.get("neighbors")
+            if bgps:
+                # Drop neighbors that were deleted and also remove self links
+                router_as = bgp_config.get("parameters", {}).get("router-as")
+                bgps[:] = [
+                    bgp
+                    for bgp in bgps
+                    if bgp["remote-as"] not in self.deleted_routers
+                    and bgp["remote-as"] != router_as
+                ]
 
     def remove_unused_bgp_interfaces(self):
         """
@@ -255,26 +260,15 @@ class PruneCAIDA(AbstractPlugin):
         the least number of interfaces as possible for performance reasons.
         """
         next_hops = set()
-        for router in filter(
-            lambda vertex: vertex.is_decorated_by(GenericRouter), self.g.get_vertices()
-        ):
-            try:
-                bgp_neighbors = router.routing["bgp"]["neighbors"]
-            except KeyError:
-                continue
+        for router in self._routers:
+            bgp_neighbors = router.routing.get("bgp", {}).get("neighbors", ())
             for neighbor in bgp_neighbors:
                 next_hops.add(str(neighbor["address"]))
 
-        for router in filter(
-            lambda vertex: vertex.is_decorated_by(GenericRouter), self.g.get_vertices()
-        ):
-            del_interfaces = []
-            for interface in router.interfaces.interfaces:
-                if (
-                    interface["switch"].name == "SWITCH_BGP_CONTROL"
-                    and str(interface["address"]) not in next_hops
-                ):
-                    del_interfaces.append(interface)
-
-            for interface in del_interfaces:
-                router.interfaces.del_interface(interface["name"])
+        for router in self._routers:
+            router.interfaces.interfaces = [
+                interface
+                for interface in router.interfaces.interfaces
+                if interface["switch"].name != "SWITCH_BGP_CONTROL"
+                or str(interface["address"]) in next_hops
+            ]
@@ -1,10 +1,15 @@
+import os
 import json
+import contextlib
 from pprint import pprint
 
 from base_objects import VMEndpoint
 
 from firewheel.control.experiment_graph import AbstractPlugin
 
+# The types (and dictionary key types) that ``json`` can encode as they are
+_JSON_PRIMITIVES = (str, int, float, bool, type(None))
+
 
 class Save(AbstractPlugin):
     """
@@ -28,91 +33,45 @@ class Save(AbstractPlugin):
                 "Must provide a filename to ``caida.save`` for the JSON output."
             )
 
-        output = {"vertices": []}
-
-        for vertex in self.g.get_vertices():
-            if not vertex.is_decorated_by(VMEndpoint):
-                # Don't need switches since they can be backed out from
-                # VMEndpoint interfaces
+        # Index the routers by AS number and cache the switches each vertex is
+        # connected to, since both are looked up for every BGP neighbor.
+        self._routers_by_as = {}
+        for v in self.g.get_vertices():
+            if v.type != "router":
                 continue
-
-            attributes = {}
-
-            for obj in vertex.__dict__:
-                if obj in {"valid", "skip_list", "graph_id"}:
-                    continue
-                if self.is_jsonable(vertex.__dict__[obj]):
-                    attributes[obj] = vertex.__dict__[obj]
-
             try:
-                attributes["interfaces"] = []
-                for interface in vertex.interfaces.interfaces:
-                    iface = {}
-                    for key in interface:
-                        if key == "switch":
-                            iface[key] = interface[key].name
-                        else:
-                            iface[key] = str(interface[key])
-                    attributes["interfaces"].append(iface)
-            except KeyError:
-                pass
-
-            try:
-                # Trigger KeyError to skip if this vertex
-                # isn't configured for BGP routing
-                vertex.routing["bgp"]
-
-                # Pick up the routing dictionary that was
-                # skipped above due to unserializable values
-                attributes["routing"] = vertex.routing
-
-                try:
-                    networks = []
-                    for network in attributes["routing"]["bgp"]["networks"]:
-                        networks.append(str(network))
-                    attributes["routing"]["bgp"]["networks"] = networks
-                except KeyError:
-                    # Not every BGP router advertises its own networks
-                    pass
-
-                try:
-                    neighbors = {}
-                    for n in attributes["routing"]["bgp"]["neighbors"]:
-                        neighbor = self.find_router_by_as(n["remote-as"])
-                        if not neighbor:
-                            print(
-                                "Could not find neighbor with AS: %s" % n["remote-as"]
-                            )
-                            continue
-                        switch = self.find_switch(vertex, neighbor)
-                        if not switch:
-                            print(
-                                "Could not find switch between: %s <-> %s"
-                                % (vertex.name, neighbor.name)
-                            )
-                            continue
-                        neighbors[neighbor.name] = switch
-
-                    attributes["routing"]["bgp"]["neighbors"] = neighbors
-                except KeyError:
-                    print("BGP router has no neighbors: %s" % vertex.name)
-
-            except AttributeError:
-                # This is an out if this vertex isn't a router and therefore
-                # does not have a routing attribute
-                pass
-            except KeyError:
-                # This is an out for routers that don't have BGP configured
-                pass
-            except Exception:  # noqa: BLE001
-                print("Could not handle routing parameters:")
-                pprint(vertex.routing)
-                del attributes["routing"]
-
-            output["vertices"].append(attributes)
-
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=4)
+                remote_as = v.routing["bgp"]["parameters"]["router-as"]
+            except (AttributeError, KeyError):
+                # Handle routers with no routing information and non-BGP routers
+                continue
+            # Keep the first router found for an AS number
+            self._routers_by_as.setdefault(remote_as, v)
+        self._switch_names = {}
+
+        # Write each vertex out as it is built rather than holding the
+        # attributes of the whole topology in memory. The output goes to a
+        # temporary file first so that an error part way through can't leave
+        # a truncated file in place of a previous save.
+        tmp_filename = f"{filename}.tmp"
+        try:
+            with open(tmp_filename, "w", encoding="utf-8") as f:
+                f.write('{"vertices": [')
+                separator = "\n"
+                for vertex in self.g.get_vertices():
+                    if not vertex.is_decorated_by(VMEndpoint):
+                        # Don't need switches since they can be backed out from
+                        # VMEndpoint interfaces
+                        continue
+
+                    f.write(separator)
+                    f.write(json.dumps(self.get_vertex_attributes(vertex), indent=4))
+                    separator = ",\n"
+                f.write("\n]}\n")
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_filename)
+            raise
 
     def is_jsonable(self, obj):
         """
@@ -124,12 +83,108 @@ class Save(AbstractPlugin):
         Returns:
             bool: :py:data:`True` if the object can be serialized to JSON, :py:data:`False` otherwise.
         """
+        # Most attributes are plain values or containers of them, which can be
+        # checked directly instead of running them through the encoder
+        if isinstance(obj, _JSON_PRIMITIVES):
+            return True
+        if isinstance(obj, (list, tuple)):
+            return all(self.is_jsonable(item) for item in obj)
+        if isinstance(obj, dict):
+            return all(
+                isinstance(key, _JSON_PRIMITIVES) and self.is_jsonable(value)
+                for key, value in obj.items()
+            )
+
         try:
             json.dumps(obj)
             return True
         except TypeError:
             return False
 
+    def get_vertex_attributes(self, vertex):
+        """
+        Get the JSON serializable attributes of a vertex, including its
+        interfaces and BGP configuration.
+
+        Args:
+            vertex (Vertex): The vertex to serialize.
+
+        Returns:
+            dict: The attributes of the vertex to save.
+        """
+        attributes = {}
+
+        for obj in vertex.__dict__:
+            if obj in {"valid", "skip_list", "graph_id"}:
+                continue
+            if self.is_jsonable(vertex.__dict__[obj]):
+                attributes[obj] = vertex.__dict__[obj]
+
+        try:
+            attributes["interfaces"] = []
+            for interface in vertex.interfaces.interfaces:
+                iface = {}
+                for key in interface:
+                    if key == "switch":
+                        iface[key] = interface[key].name
+                    else:
+                        iface[key] = str(interface[key])
+                attributes["interfaces"].append(iface)
+        except KeyError:
+            pass
+
+        try:
+            # Trigger KeyError to skip if this vertex
+            # isn't configured for BGP routing
+            vertex.routing["bgp"]
+
+            # Pick up the routing dictionary that was
+            # skipped above due to unserializable values
+            attributes["routing"] = vertex.routing
+
+            try:
+                networks = []
+                for network in attributes["routing"]["bgp"]["networks"]:
+                    networks.append(str(network))
+                attributes["routing"]["bgp"]["networks"] = networks
+            except KeyError:
+                # Not every BGP router advertises its own networks
+                pass
+
+            try:
+                neighbors = {}
+                for n in attributes["routing"]["bgp"]["neighbors"]:
+                    neighbor = self.find_router_by_as(n["remote-as"])
+                    if not neighbor:
+                        print("Could not find neighbor with AS: %s" % n["remote-as"])
+                        continue
+                    switch = self.find_switch(vertex, neighbor)
+                    if not switch:
+                        print(
+                            "Could not find switch between: %s <-> %s"
+                            % (vertex.name, neighbor.name)
+                        )
+                        continue
+                    neighbors[neighbor.name] = switch
+
+                attributes["routing"]["bgp"]["neighbors"] = neighbors
+            except KeyError:
+                print("BGP router has no neighbors: %s" % vertex.name)
+
+        except AttributeError:
+            # This is an out if this vertex isn't a router and therefore
+            # does not have a routing attribute
+            pass
+        except KeyError:
+            # This is an out for routers that don't have BGP configured
+            pass
+        except Exception:  # noqa: BLE001
+            print("Could not handle routing parameters:")
+            pprint(vertex.routing)
+            del attributes["routing"]
+
+        return attributes
+
     def find_router_by_as(self, bgp_as):
         """
         Find a router vertex by its BGP AS number.
@@ -140,20 +195,7 @@ class Save(AbstractPlugin):
         Returns:
             Vertex: The router vertex with the specified BGP AS number, or None if not found.
         """
-        for v in self.g.get_vertices():
-            if v.type != "router":
-                continue
-            try:
-                remote_as = v.routing["bgp"]["parameters"]["router-as"]
-                if remote_as == bgp_as:
-                    return v
-            except AttributeError:
-                # Handle routers with no routing information
-                continue
-            except KeyError:
-                # Handle non-BGP routers
-                continue
-        return None
+        return self._routers_by_as.get(bgp_as)
 
     def find_switch(self, v1, v2):
         """
@@ -168,14 +210,7 @@ class Save(AbstractPlugin):
         Returns:
             Vertex: The switch vertex that connects the two routers, or None if not found.
         """
-        v1_switches = set()
-        for interface in v1.interfaces.interfaces:
-            v1_switches.add(interface["switch"].name)
-        v2_switches = set()
-        for interface in v2.interfaces.interfaces:
-            v2_switches.add(interface["switch"].name)
-
-        result = v1_switches & v2_switches
+        result = self.get_switch_names(v1) & self.get_switch_names(v2)
         if not result:
             return None
         if len(result) > 1:
@@ -185,4 +220,21 @@ class Save(AbstractPlugin):
             )
 
         # only return a single switch
-        return result.pop()
+        return next(iter(result))
+
+    def get_switch_names(self, vertex):
+        """
+        Get the names of the switches that a vertex has interfaces on.
+        The names are cached since each router is checked once per BGP neighbor.
+
+        Args:
+            vertex (Vertex): The vertex whose switches should be found.
+
+        Returns:
+            frozenset: The names of the switches connected to the vertex.
+        """
+        if vertex.graph_id not in self._switch_names:
+            self._switch_names[vertex.graph_id] = frozenset(
+                interface["switch"].name for interface in vertex.interfaces.interfaces
+            )
+        return self._switch_names[vertex.graph_id]
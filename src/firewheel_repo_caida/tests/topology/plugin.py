@@ -1,7 +1,7 @@
-from random import choice
+from random import sample
 
 from netaddr import IPNetwork
-from base_objects import VMEndpoint
+from base_objects import Switch, VMEndpoint
 from generic_vm_objects import GenericRouter
 
 from firewheel.control.experiment_graph import Vertex, AbstractPlugin
@@ -21,7 +21,8 @@ class Topology(AbstractPlugin):
         The method performs the following steps:
         1. Converts the num_hosts parameter to an integer.
         2. Selects routers with BGP networks.
-        3. Chooses a specified number of routers randomly.
+        3. Chooses a specified number of routers randomly (or all of them if
+           there are fewer routers than ``num_hosts``).
         4. Creates hosts and connects them to the appropriate switches.
 
         Args:
@@ -38,33 +39,37 @@ class Topology(AbstractPlugin):
             print("Must provide an integer as a parameter to the test CAIDA topology")
             raise
 
-        chosen = []
+        # Index the BGP switches by name while looking for routers so that each
+        # host's switch can be found without searching the graph again
         nodes = []
+        bgp_switches = {}
         for vertex in self.g.get_vertices():
-            if vertex.is_decorated_by(GenericRouter) and vertex.get_all_bgp_networks():
-                nodes.append(vertex)
+            if vertex.is_decorated_by(GenericRouter):
+                # Keep the networks so they are not looked up again for the host
+                networks = vertex.get_all_bgp_networks()
+                if networks:
+                    nodes.append((vertex, networks))
+            elif vertex.is_decorated_by(Switch) and vertex.name.startswith("BGP-"):
+                bgp_switches[vertex.name] = vertex
 
         if not nodes:
             raise RuntimeError(f"No nodes found: {len(nodes)}")
 
-        for _i in range(num_hosts):
-            router = choice(nodes)
-            chosen.append(router)
-            nodes.remove(router)
+        chosen = sample(nodes, max(0, min(num_hosts, len(nodes))))
+        if len(chosen) < num_hosts:
+            print(
+                "Only %d routers with BGP networks found, creating %d of %d hosts"
+                % (len(nodes), len(chosen), num_hosts)
+            )
 
-        for router in chosen:
-            networks = router.get_all_bgp_networks()
+        for router, networks in chosen:
             network = IPNetwork(networks[0])
 
-            switch = self.g.find_vertex(
-                "BGP-%s" % str(network.cidr).replace(".", "-").replace("/", "-")
-            )
+            cidr = str(network.cidr).replace(".", "-").replace("/", "-")
+            switch_name = "BGP-%s" % cidr
+            switch = bgp_switches.get(switch_name)
             if not switch:
-                print(
-                    "Unable to find switch: %s"
-                    % "BGP-%s"
-                    % str(network.cidr).replace(".", "-").replace("/", "-")
-                )
+                print("Unable to find switch: %s" % switch_name)
                 continue
 
             host = Vertex(self.g, router.name.replace("router", "host"))